@@ -0,0 +1 @@
+"""Makes the top-level scripts importable from tests/."""
@@ -0,0 +1,33 @@
+"""
+Embedding Quantization
+======================
+int8 quantization shared by the scripts that store embeddings in Firestore.
+The TypeScript retrieval system reverses it with dequantizeEmbedding().
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# Also store each embedding as a float array next to its int8 form. Only
+# needed while a retrieval deployment that predates embeddingQ8 is still live
+# (see FIRESTORE_COLLECTIONS.md); when False, the ChromaDB sync removes the
+# float field from vectorChunks.
+WRITE_FLOAT_EMBEDDING = False
+
+
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize embeddings to int8 with one symmetric scale per vector.
+    
+    Args:
+        embeddings (np.ndarray): (n, d) float embeddings
+    
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (n, d) int8 values and (n,) float32 scales,
+            where embedding ≈ values * scale
+    """
+    scales = np.abs(embeddings).max(axis=1, keepdims=True) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.round(embeddings / scales).astype(np.int8)
+    return quantized, scales[:, 0].astype(np.float32)
@@ -57,6 +57,20 @@ export function cosineSimilarity(vecA: number[], vecB: number[]): number {
   return dotProduct / (magnitudeA * magnitudeB);
 }
 
+/**
+ * Restores a float embedding from its int8-quantized form.
+ * The ingestion scripts store each component as round(value / scale),
+ * with one scale per vector (max |value| / 127).
+ *
+ * @param quantized - Raw int8 bytes (Firestore Bytes field, a Buffer in the Admin SDK)
+ * @param scale - Per-vector scale stored next to the bytes
+ * @returns Dequantized embedding vector
+ */
+export function dequantizeEmbedding(quantized: Uint8Array, scale: number): number[] {
+  const values = new Int8Array(quantized.buffer, quantized.byteOffset, quantized.byteLength);
+  return Array.from(values, (value) => value * scale);
+}
+
 /**
  * Generates a vector embedding for a query/question using Vertex AI text-embedding-004.
  * Uses the same embedding model as the ingestion pipeline for consistency.
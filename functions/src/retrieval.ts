@@ -1,13 +1,15 @@
 import { getFirestore } from 'firebase-admin/firestore';
 import { getQuestionVector } from './helpers/vector-helpers.js';
-import { cosineSimilarity } from './helpers/vector-helpers.js';
+import { cosineSimilarity, dequantizeEmbedding } from './helpers/vector-helpers.js';
 import * as logger from 'firebase-functions/logger'; // <--- FIX: Added necessary import
 
 // Type definitions
 interface ChunkDocument {
   id: string;
   content: string;
-  embedding: number[];
+  embedding?: number[];
+  embeddingQ8?: Uint8Array;
+  embeddingScale?: number;
   documentId: string;
   source: string;
   pageNumber: number;
@@ -68,13 +70,18 @@ export async function retrieveTopKChunks(
       // Ensure document data exists before proceeding
       const chunkData = doc.data() as ChunkDocument;
 
-      if (!chunkData || !chunkData.embedding || !Array.isArray(chunkData.embedding) || !chunkData.content || !chunkData.source) {
+      // Prefer the int8-quantized embedding; fall back to the float array for older chunks
+      const embedding = chunkData?.embeddingQ8 && typeof chunkData.embeddingScale === 'number'
+        ? dequantizeEmbedding(chunkData.embeddingQ8, chunkData.embeddingScale)
+        : chunkData?.embedding;
+
+      if (!chunkData || !embedding || !Array.isArray(embedding) || !chunkData.content || !chunkData.source) {
         logger.warn(`⚠️  Chunk ${doc.id} missing required fields or invalid embedding, skipping.`); // Uses logger
         return;
       }
 
       // Calculate the similarity score
-      const similarity = cosineSimilarity(queryVector, chunkData.embedding);
+      const similarity = cosineSimilarity(queryVector, embedding);
 
       // Keep only chunks where similarity score is greater than 0.5 (lowered from 0.7 for better recall)
       // You can adjust this threshold based on your needs:
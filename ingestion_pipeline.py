@@ -12,16 +12,29 @@ Future Integration Points:
 - Vertex AI Vector Search for production-scale vector indexing
 """
 
+import argparse
+import asyncio
+import functools
+import hashlib
+import itertools
+import json
+import logging
 import os
 import sys
 import tempfile
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
+# PDF parsing
+import fitz  # PyMuPDF
+import numpy as np
+
 # LangChain imports
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_google_vertexai import VertexAIEmbeddings
+from tokenizers import Tokenizer
 
 # ChromaDB imports
 import chromadb
@@ -31,6 +44,76 @@ from chromadb.config import Settings
 from google.cloud import aiplatform
 from google.cloud import storage
 from google.auth import default as google_auth_default
+from google.api_core.exceptions import InvalidArgument, ResourceExhausted
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+
+# Progress bars are disabled in pool workers, where they would interleave
+_show_progress = True
+
+LOG_FORMAT = "%(asctime)s %(message)s"
+
+# ChromaDB collection holding the PDF chunks
+COLLECTION_NAME = "pdf_documents"
+
+# HNSW index settings for bulk ingestion: a moderate construction_ef keeps
+# graph builds fast, and large batch/sync thresholds let Chroma add vectors
+# to the graph in bulk instead of per upsert. search_ef only affects queries.
+# (Only applied when the collection is first created.)
+COLLECTION_METADATA = {
+    "description": "PDF document chunks with embeddings",
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 100,
+    "hnsw:M": 16,
+    "hnsw:search_ef": 100,
+    "hnsw:batch_size": 1000,
+    "hnsw:sync_threshold": 2000,
+}
+
+# Server-side filter for PDF objects (case-insensitive extension)
+PDF_MATCH_GLOB = "**.[pP][dD][fF]"
+
+# Records the GCS generation of each ingested PDF so unchanged files are skipped
+INGEST_MANIFEST_FILENAME = "ingest_manifest.json"
+
+# One ChromaDB row: (id, embedding, document text, metadata)
+ChunkRecord = Tuple[str, np.ndarray, str, Dict[str, Any]]
+
+# Token-based chunking (sizes are in tokenizer tokens, not characters)
+TOKENIZER_NAME = "bert-base-uncased"
+CHUNK_SIZE_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+
+# Recorded per PDF in the ingestion manifest; changing any of these makes the
+# next run re-ingest every PDF
+CHUNK_SETTINGS = {
+    "tokenizer": TOKENIZER_NAME,
+    "chunk_size": CHUNK_SIZE_TOKENS,
+    "chunk_overlap": CHUNK_OVERLAP_TOKENS,
+}
+
+# PDFs with at least this many pages are parsed in a process pool
+PARALLEL_PARSE_MIN_PAGES = 50
+PAGES_PER_WORKER_TASK = 5
+
+# Vertex AI embedding batch sizes (halved on quota/token-limit errors)
+EMBEDDING_BATCH_SIZE = 250
+MIN_EMBEDDING_BATCH_SIZE = 5
+EMBEDDING_CONCURRENCY = 8
+
+# PDFs processed in parallel by main(). Each worker keeps up to
+# EMBEDDING_CONCURRENCY embedding requests in flight, so this bounds the
+# total load on the Vertex AI quota (4 x 8 = 32 requests), independent of
+# the number of cores.
+MAX_INGEST_WORKERS = 4
+EMBEDDING_DIM = 768  # text-embedding-004 output dimension
+
+# Number of chunks written to ChromaDB per upsert call
+UPSERT_BATCH_SIZE = 200
+
+# Resumable embedding checkpoints (removed once a PDF is indexed)
+EMBEDDING_CHECKPOINT_DIR = "./.ingest_checkpoints"
 
 
 def setup_google_cloud_authentication():
@@ -65,31 +148,149 @@ def setup_google_cloud_authentication():
         print("   Ensure GOOGLE_APPLICATION_CREDENTIALS is set or ADC is configured.")
 
 
-def list_pdfs_in_bucket(gcs_bucket_name: str = "minewise-bucket") -> List[str]:
+@functools.lru_cache(maxsize=1)
+def _get_storage_client() -> storage.Client:
+    """Return the process-wide GCS client."""
+    return storage.Client()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embeddings_model() -> VertexAIEmbeddings:
+    """Return the process-wide Vertex AI embeddings model (text-embedding-004)."""
+    return VertexAIEmbeddings(
+        model_name="text-embedding-004",
+        project=os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCP_PROJECT_ID"),
+        location="us-central1"
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_chroma_collection(vector_store_dir: str):
     """
-    List all PDF files in the GCS bucket.
+    Return the ChromaDB collection used for PDF chunks, opening it once per directory.
+    
+    Args:
+        vector_store_dir (str): Directory path where ChromaDB will store its data
+    
+    Returns:
+        ChromaDB collection
+    """
+    # Initialize ChromaDB client (persistent local storage)
+    chroma_client = chromadb.PersistentClient(
+        path=vector_store_dir,
+        settings=Settings(anonymized_telemetry=False)
+    )
+    
+    # Get or create collection
+    return chroma_client.get_or_create_collection(
+        name=COLLECTION_NAME,
+        metadata=COLLECTION_METADATA
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_text_splitter() -> RecursiveCharacterTextSplitter:
+    """Return the process-wide token-aware text splitter (loads the tokenizer once)."""
+    tokenizer = Tokenizer.from_pretrained(TOKENIZER_NAME)
+    
+    def count_tokens(text: str) -> int:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE_TOKENS,
+        chunk_overlap=CHUNK_OVERLAP_TOKENS,
+        length_function=count_tokens,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+def _init_ingest_worker() -> None:
+    """
+    Process pool initializer for per-PDF workers.
+    
+    Drops cached clients inherited from the parent process (their connections
+    are not fork-safe) and turns off progress bars, which would interleave.
+    Logging is configured here too, since spawned workers don't inherit the
+    parent's handlers.
+    """
+    global _show_progress
+    _show_progress = False
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    _get_storage_client.cache_clear()
+    _get_embeddings_model.cache_clear()
+    _get_chroma_collection.cache_clear()
+
+
+def list_pdf_generations(gcs_bucket_name: str = "minewise-bucket", prefix: Optional[str] = None) -> Dict[str, int]:
+    """
+    List all PDF files in the GCS bucket together with their object generation.
+    
+    The generation changes every time an object is overwritten, so it can be
+    used to detect PDFs that changed since the last ingestion. Filtering is done
+    server-side (glob on the .pdf extension) and the listing requests only the
+    name and generation fields.
     
     Args:
         gcs_bucket_name (str): GCS bucket name
+        prefix (str, optional): Only list objects under this path prefix
         
     Returns:
-        List[str]: List of blob names (paths) for PDF files in the bucket
+        Dict[str, int]: Blob name -> generation, ordered by blob name
     """
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(gcs_bucket_name)
+        blobs = _get_storage_client().list_blobs(
+            gcs_bucket_name,
+            prefix=prefix,
+            match_glob=PDF_MATCH_GLOB,
+            fields="items(name,generation),nextPageToken"
+        )
         
-        pdf_files = []
-        for blob in bucket.list_blobs():
+        pdf_files = {}
+        for blob in blobs:
             if blob.name.lower().endswith('.pdf'):
-                pdf_files.append(blob.name)
+                pdf_files[blob.name] = blob.generation
         
-        return sorted(pdf_files)
+        return dict(sorted(pdf_files.items()))
     except Exception as e:
         print(f"❌ Error listing PDFs in bucket: {e}")
         raise
 
 
+def list_pdfs_in_bucket(gcs_bucket_name: str = "minewise-bucket", prefix: Optional[str] = None) -> List[str]:
+    """
+    List all PDF files in the GCS bucket.
+    
+    Args:
+        gcs_bucket_name (str): GCS bucket name
+        prefix (str, optional): Only list objects under this path prefix
+        
+    Returns:
+        List[str]: List of blob names (paths) for PDF files in the bucket
+    """
+    return list(list_pdf_generations(gcs_bucket_name, prefix))
+
+
+def load_ingest_manifest(vector_store_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the ingestion manifest (blob name -> {generation, num_chunks, chunk_settings}).
+    
+    Returns an empty manifest if the file does not exist yet.
+    """
+    manifest_path = os.path.join(vector_store_dir, INGEST_MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_ingest_manifest(vector_store_dir: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """Write the ingestion manifest to the vector store directory."""
+    os.makedirs(vector_store_dir, exist_ok=True)
+    manifest_path = os.path.join(vector_store_dir, INGEST_MANIFEST_FILENAME)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
 def download_pdf_from_gcs(gcs_bucket_name: str, blob_name: str, local_path: Optional[str] = None) -> str:
     """
     Download a PDF file from GCS bucket to a local temporary file.
@@ -103,8 +304,7 @@ def download_pdf_from_gcs(gcs_bucket_name: str, blob_name: str, local_path: Opti
         str: Path to the downloaded local file
     """
     try:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(gcs_bucket_name)
+        bucket = _get_storage_client().bucket(gcs_bucket_name)
         blob = bucket.blob(blob_name)
         
         if local_path is None:
@@ -121,146 +321,492 @@ def download_pdf_from_gcs(gcs_bucket_name: str, blob_name: str, local_path: Opti
         raise
 
 
-def ingest_pdf_to_vectorstore(pdf_path: str, vector_store_dir: str, gcs_bucket_name: str = "minewise-bucket", gcs_blob_name: Optional[str] = None):
+def download_pdf_bytes(gcs_bucket_name: str, blob_name: str) -> bytes:
     """
-    Main ingestion function that processes a PDF file and indexes it in a vector store.
+    Download a PDF file from GCS bucket into memory.
+    
+    Args:
+        gcs_bucket_name (str): GCS bucket name
+        blob_name (str): Name/path of the blob in the bucket
+        
+    Returns:
+        bytes: Raw PDF content
+    """
+    try:
+        bucket = _get_storage_client().bucket(gcs_bucket_name)
+        return bucket.blob(blob_name).download_as_bytes()
+    except Exception as e:
+        print(f"❌ Error downloading PDF from GCS: {e}")
+        raise
+
+
+def _open_pdf(pdf_path: str, pdf_bytes: Optional[bytes] = None):
+    """Open a PDF with PyMuPDF from in-memory bytes if given, otherwise from disk."""
+    if pdf_bytes is not None:
+        return fitz.open(stream=pdf_bytes, filetype="pdf")
+    return fitz.open(pdf_path)
+
+
+# PDF bytes shared with process pool workers (set once per worker by the initializer)
+_worker_pdf_bytes: Optional[bytes] = None
+
+
+def _init_extract_worker(pdf_bytes: Optional[bytes]) -> None:
+    """Process pool initializer: keep the PDF bytes so they are not pickled per task."""
+    global _worker_pdf_bytes
+    _worker_pdf_bytes = pdf_bytes
+
+
+def _extract_pages(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract text for pages [start, end) of a PDF (process pool worker).
+    
+    PyMuPDF documents are not picklable, so each worker opens its own handle.
+    """
+    pdf_doc = _open_pdf(pdf_path, _worker_pdf_bytes)
+    try:
+        return [(i, pdf_doc[i].get_text("text")) for i in range(start, end)]
+    finally:
+        pdf_doc.close()
+
+
+def load_pdf_documents(pdf_path: str, pdf_bytes: Optional[bytes] = None, parallel: bool = True) -> List[Document]:
+    """
+    Load a PDF into one LangChain Document per page using PyMuPDF.
+    
+    Small PDFs are parsed sequentially; PDFs with PARALLEL_PARSE_MIN_PAGES or
+    more pages are split into page ranges and parsed in a process pool.
+    
+    Args:
+        pdf_path (str): Path to the local PDF file (used as the source if pdf_bytes is given)
+        pdf_bytes (bytes, optional): In-memory PDF content
+        parallel (bool): Allow the process pool for large PDFs
+        
+    Returns:
+        List[Document]: Page documents ordered by page index
+    """
+    pdf_doc = _open_pdf(pdf_path, pdf_bytes)
+    try:
+        page_count = pdf_doc.page_count
+        use_pool = parallel and page_count >= PARALLEL_PARSE_MIN_PAGES
+        if not use_pool:
+            page_texts = [(i, page.get_text("text")) for i, page in enumerate(pdf_doc)]
+    finally:
+        pdf_doc.close()
+    
+    if use_pool:
+        max_workers = min(os.cpu_count() or 1, 8)
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_extract_worker,
+            initargs=(pdf_bytes,)
+        ) as executor:
+            futures = [
+                executor.submit(_extract_pages, pdf_path, start, min(start + PAGES_PER_WORKER_TASK, page_count))
+                for start in range(0, page_count, PAGES_PER_WORKER_TASK)
+            ]
+            page_texts = [page for future in futures for page in future.result()]
+    
+    return [
+        Document(page_content=text, metadata={"page": i, "source": pdf_path})
+        for i, text in sorted(page_texts)
+    ]
+
+
+async def _aembed_batch(
+    model: VertexAIEmbeddings,
+    texts: List[str],
+    min_batch: int,
+    semaphore: asyncio.Semaphore
+) -> List[List[float]]:
+    """
+    Embed one batch, splitting it in half when Vertex AI rejects the request.
+    
+    The semaphore bounds the number of in-flight requests; it is released
+    before the halves are retried so they can be scheduled independently.
+    """
+    async with semaphore:
+        try:
+            return await asyncio.to_thread(
+                model.embed_documents,
+                texts,
+                batch_size=len(texts),
+                embeddings_task_type="RETRIEVAL_DOCUMENT"
+            )
+        except (ResourceExhausted, InvalidArgument) as e:
+            if len(texts) <= min_batch:
+                raise
+            error_name = type(e).__name__
+    
+    mid = max(len(texts) // 2, min_batch)
+    logger.warning(f"   ⚠️  Embedding batch rejected ({error_name}), retrying with batch size {mid}")
+    left, right = await asyncio.gather(
+        _aembed_batch(model, texts[:mid], min_batch, semaphore),
+        _aembed_batch(model, texts[mid:], min_batch, semaphore)
+    )
+    return left + right
+
+
+async def _aembed_in_batches(
+    model: VertexAIEmbeddings,
+    texts: List[str],
+    initial: int = EMBEDDING_BATCH_SIZE,
+    min_batch: int = MIN_EMBEDDING_BATCH_SIZE,
+    max_concurrency: int = EMBEDDING_CONCURRENCY
+) -> List[List[float]]:
+    """
+    Embed texts in concurrent batches, shrinking batches that Vertex AI rejects.
+    
+    Texts are sliced into batches of `initial` and up to `max_concurrency`
+    requests are kept in flight. A batch that hits the quota (429) or the
+    per-request token limit is halved (down to `min_batch`) and retried.
+    
+    Args:
+        model (VertexAIEmbeddings): Embedding model
+        texts (List[str]): Texts to embed
+        initial (int): Starting batch size
+        min_batch (int): Smallest batch size before giving up
+        max_concurrency (int): Maximum number of concurrent requests
+        
+    Returns:
+        List[List[float]]: Embeddings in the same order as `texts`
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(*[
+        _aembed_batch(model, texts[i:i + initial], min_batch, semaphore)
+        for i in range(0, len(texts), initial)
+    ])
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+
+def _embed_in_batches(model: VertexAIEmbeddings, texts: List[str], **kwargs) -> List[List[float]]:
+    """Synchronous entry point for _aembed_in_batches."""
+    return asyncio.run(_aembed_in_batches(model, texts, **kwargs))
+
+
+def _source_key(source: str) -> str:
+    """
+    Hash a PDF's full GCS blob name or local path.
+    
+    Used in chunk IDs and checkpoint file names, so PDFs with the same file
+    name in different folders never collide.
+    """
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+
+def _checkpoint_paths(cache_dir: str, source: str) -> Tuple[str, str]:
+    """Return the (array, offsets) checkpoint file paths for a PDF."""
+    key = _source_key(source)
+    return (
+        os.path.join(cache_dir, f"emb_{key}.f32"),
+        os.path.join(cache_dir, f"emb_{key}.offsets.json")
+    )
+
+
+def clear_embedding_checkpoint(cache_dir: Optional[str], source: str) -> None:
+    """Delete a PDF's embedding checkpoint once its chunks are indexed."""
+    if cache_dir is None:
+        return
+    for path in _checkpoint_paths(cache_dir, source):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"   ⚠️  Could not remove checkpoint file {path}: {e}")
+
+
+def _embed_with_checkpoint(
+    model: VertexAIEmbeddings,
+    texts: List[str],
+    text_hashes: List[str],
+    cache_dir: Optional[str],
+    source: str
+) -> np.ndarray:
+    """
+    Embed texts into a float32 array, checkpointing progress to disk.
+    
+    With a cache_dir, embeddings are written to a memory-mapped file and the
+    number of completed rows is recorded in a JSON offsets file after each
+    group of batches. A rerun for the same chunk texts (matched by their
+    hashes) resumes after the last completed group instead of re-embedding
+    everything.
+    
+    Args:
+        model (VertexAIEmbeddings): Embedding model
+        texts (List[str]): Texts to embed
+        text_hashes (List[str]): Content hash of each text
+        cache_dir (str, optional): Directory for the checkpoint files; None keeps
+            the embeddings in memory only
+        source (str): GCS blob name or local path of the PDF, which keys its
+            checkpoint files
+        
+    Returns:
+        np.ndarray: (len(texts), EMBEDDING_DIM) float32 embeddings
+    """
+    shape = (len(texts), EMBEDDING_DIM)
+    if not texts:
+        return np.empty(shape, dtype=np.float32)
+    
+    completed = 0
+    if cache_dir is None:
+        arr = np.empty(shape, dtype=np.float32)
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        array_path, offsets_path = _checkpoint_paths(cache_dir, source)
+        fingerprint = hashlib.sha1("".join(text_hashes).encode("utf-8")).hexdigest()
+        
+        if os.path.exists(array_path) and os.path.exists(offsets_path):
+            with open(offsets_path, "r", encoding="utf-8") as f:
+                offsets = json.load(f)
+            if offsets.get("fingerprint") == fingerprint:
+                completed = offsets.get("completed", 0)
+        
+        arr = np.memmap(array_path, dtype=np.float32, mode="r+" if completed else "w+", shape=shape)
+        if completed:
+            logger.info(f"   ♻️  Resuming from checkpoint: {completed}/{len(texts)} embedding(s) already computed")
+    
+    # Checkpoint after each round of concurrent batches
+    group_size = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
+    with tqdm(total=len(texts), initial=completed, desc="Embedding", unit="chunk", disable=not _show_progress) as progress:
+        for start in range(completed, len(texts), group_size):
+            batch_vecs = _embed_in_batches(model, texts[start:start + group_size])
+            arr[start:start + len(batch_vecs)] = np.asarray(batch_vecs, dtype=np.float32)
+            if cache_dir is not None:
+                arr.flush()
+                with open(offsets_path, "w", encoding="utf-8") as f:
+                    json.dump({"fingerprint": fingerprint, "completed": start + len(batch_vecs)}, f)
+            progress.update(len(batch_vecs))
+    
+    # Plain ndarray view over the mapped file (no copy)
+    return np.asarray(arr)
+
+
+def prepare_pdf_chunks(
+    pdf_path: str,
+    gcs_bucket_name: str = "minewise-bucket",
+    gcs_blob_name: Optional[str] = None,
+    pdf_bytes: Optional[bytes] = None,
+    parallel_parse: bool = True,
+    cache_dir: Optional[str] = None
+) -> Iterator[ChunkRecord]:
+    """
+    Load, chunk and embed a PDF, returning its ChromaDB rows as a stream.
     
     Pipeline steps:
-    1. Load PDF file (from local path or GCS)
+    1. Load PDF file (from local path or in-memory bytes)
     2. Extract text content
     3. Split text into chunks
     4. Generate embeddings for each chunk
-    5. Store chunks and embeddings in ChromaDB
     
     Args:
-        pdf_path (str): Path to the local PDF file to process
-        vector_store_dir (str): Directory path where ChromaDB will store its data
+        pdf_path (str): Path to the local PDF file to process (or a label for pdf_bytes)
         gcs_bucket_name (str): GCS bucket name (default: minewise-bucket)
         gcs_blob_name (str, optional): GCS blob name if processing from bucket
+        pdf_bytes (bytes, optional): In-memory PDF content; if given, pdf_path is not read
+        parallel_parse (bool): Allow large PDFs to be parsed in a process pool
+        cache_dir (str, optional): Directory for resumable embedding checkpoints;
+            call clear_embedding_checkpoint() once the records are indexed
     
     Returns:
-        int: Number of chunks processed and indexed
+        Iterator[ChunkRecord]: (id, float32 embedding row, content, metadata) per chunk; the
+            rows are built lazily so only one upsert batch is materialized at a time
     """
-    print("\n" + "="*70)
-    print("🚀 Starting RAG Ingestion Pipeline")
-    print("="*70 + "\n")
-    
     # Determine GCS URI
     if gcs_blob_name:
         gcs_uri = f"gs://{gcs_bucket_name}/{gcs_blob_name}"
         document_source = gcs_uri
-        print(f"📄 Processing document from GCS: {gcs_uri}")
+        logger.info(f"📄 Processing document from GCS: {gcs_uri}")
     else:
         # Validate PDF file exists if it's a local file
-        if not os.path.exists(pdf_path):
+        if pdf_bytes is None and not os.path.exists(pdf_path):
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         gcs_uri = None
         document_source = pdf_path
     
-    print(f"2. Loading PDF file: {pdf_path}")
-    # Step 2: Load PDF using LangChain's PyPDFLoader
-    loader = PyPDFLoader(pdf_path)
-    documents = loader.load()
+    logger.info(f"2. Loading PDF file: {pdf_path}")
+    # Step 2: Load PDF using PyMuPDF (one Document per page, in reading order)
+    documents = load_pdf_documents(pdf_path, pdf_bytes, parallel=parallel_parse)
     
     if not documents:
         raise ValueError("No content extracted from PDF. File may be empty or corrupted.")
     
-    print(f"   ✅ Loaded {len(documents)} page(s) from PDF")
+    logger.info(f"   ✅ Loaded {len(documents)} page(s) from PDF")
     
     # Step 3: Extract text content (already extracted by loader, but we can verify)
     total_text_length = sum(len(doc.page_content) for doc in documents)
-    print(f"3. Extracted text content ({total_text_length:,} total characters)")
-    
-    # Step 4: Chunk the text using RecursiveCharacterTextSplitter
-    print("4. Splitting text into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""]
-    )
+    logger.info(f"3. Extracted text content ({total_text_length:,} total characters)")
+    
+    # Step 4: Chunk the text using RecursiveCharacterTextSplitter (token-aware)
+    logger.info("4. Splitting text into chunks...")
+    chunks = _get_text_splitter().split_documents(documents)
+    logger.info(f"   ✅ Created {len(chunks)} chunk(s) (chunk_size={CHUNK_SIZE_TOKENS} tokens, chunk_overlap={CHUNK_OVERLAP_TOKENS} tokens)")
     
-    chunks = text_splitter.split_documents(documents)
-    print(f"   ✅ Created {len(chunks)} chunk(s) (chunk_size=1000, chunk_overlap=200)")
+    # Get document name for IDs and metadata
+    if gcs_blob_name:
+        doc_name = Path(gcs_blob_name).stem
+        doc_filename = os.path.basename(gcs_blob_name)
+    else:
+        doc_name = Path(pdf_path).stem
+        doc_filename = os.path.basename(pdf_path)
     
     # Step 5: Generate embeddings using Vertex AI
-    print("5. Generating embeddings using Vertex AI (text-embedding-004)...")
+    logger.info("5. Generating embeddings using Vertex AI (text-embedding-004)...")
     
-    # Initialize Vertex AI Embeddings
-    # Note: This uses the text-embedding-004 model as specified
-    embeddings_model = VertexAIEmbeddings(
-        model_name="text-embedding-004",
-        project=os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCP_PROJECT_ID"),
-        location="us-central1"
-    )
+    # Vertex AI Embeddings (text-embedding-004), shared across PDFs
+    embeddings_model = _get_embeddings_model()
     
-    # Generate embeddings for all chunks
-    chunk_texts = [chunk.page_content for chunk in chunks]
-    print(f"   Generating embeddings for {len(chunk_texts)} chunks...")
+    # Embed each distinct chunk text once; repeated boilerplate (headers,
+    # footers, tables) shares the embedding of its first occurrence
+    chunk_hashes = [hashlib.sha1(chunk.page_content.encode("utf-8")).hexdigest() for chunk in chunks]
+    unique: Dict[str, int] = {}
+    unique_texts = []
+    for chunk, chunk_hash in zip(chunks, chunk_hashes):
+        if chunk_hash not in unique:
+            unique[chunk_hash] = len(unique_texts)
+            unique_texts.append(chunk.page_content)
+    logger.info(f"   Generating embeddings for {len(unique_texts)} unique chunk(s) ({len(chunks) - len(unique_texts)} duplicate(s) reused)...")
     
     try:
-        embeddings = embeddings_model.embed_documents(chunk_texts)
-        print(f"   ✅ Generated {len(embeddings)} embedding(s) (dimension: {len(embeddings[0])})")
+        embeddings = _embed_with_checkpoint(
+            embeddings_model, unique_texts, list(unique), cache_dir, gcs_blob_name or pdf_path
+        )
+        # Unit-normalize so cosine distance reduces to a dot product in the index.
+        # Not in place: the array may be backed by the checkpoint memmap, which
+        # must keep the raw vectors
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1.0)
+        logger.info(f"   ✅ Generated {embeddings.shape[0]} embedding(s) (dimension: {embeddings.shape[1]})")
     except Exception as e:
-        print(f"   ❌ Error generating embeddings: {e}")
+        logger.error(f"   ❌ Error generating embeddings: {e}")
         raise
+    del unique_texts
     
-    # Step 6: Index/Upsert into ChromaDB
-    print(f"6. Indexing chunks into ChromaDB at '{vector_store_dir}'...")
+    # Metadata shared by every chunk of this document (built once)
+    base_metadata = {
+        "source": document_source,
+        "gcs_uri": gcs_uri or None,
+        "gcs_blob_name": gcs_blob_name or None,
+        "document_name": doc_filename
+    }
     
-    # Initialize ChromaDB client (persistent local storage)
-    chroma_client = chromadb.PersistentClient(
-        path=vector_store_dir,
-        settings=Settings(anonymized_telemetry=False)
-    )
+    # IDs carry a hash of the full blob path: the stem alone is shared by
+    # PDFs with the same file name in different folders
+    source_key = _source_key(gcs_blob_name or pdf_path)[:12]
     
-    # Get or create collection
-    collection_name = "pdf_documents"
-    collection = chroma_client.get_or_create_collection(
-        name=collection_name,
-        metadata={"description": "PDF document chunks with embeddings"}
-    )
+    def _emit() -> Iterator[ChunkRecord]:
+        # Include metadata: source file, page number
+        for i, (chunk, chunk_hash) in enumerate(zip(chunks, chunk_hashes)):
+            yield (
+                f"chunk_{i}_{doc_name}_{source_key}",
+                embeddings[unique[chunk_hash]],
+                chunk.page_content,
+                {
+                    **base_metadata,
+                    "page_number": chunk.metadata.get("page", 0),
+                    "chunk_index": i,
+                    "chunk_hash": chunk_hash
+                }
+            )
     
-    # Prepare documents for insertion
-    # Include metadata: source file, page number
-    ids = []
-    metadatas = []
-    contents = []
+    return _emit()
+
+
+def index_chunks(collection, records: Iterable[ChunkRecord], total: Optional[int] = None) -> int:
+    """
+    Upsert chunk records into ChromaDB in batches of UPSERT_BATCH_SIZE.
     
-    # Get document name for IDs and metadata
-    if gcs_blob_name:
-        doc_name = Path(gcs_blob_name).stem
-        doc_filename = os.path.basename(gcs_blob_name)
-    else:
-        doc_name = Path(pdf_path).stem
-        doc_filename = os.path.basename(pdf_path)
+    Records are consumed lazily, so only one batch is held in memory at a time.
     
-    for i, chunk in enumerate(chunks):
-        chunk_id = f"chunk_{i}_{doc_name}"
-        ids.append(chunk_id)
-        
-        # Extract metadata from LangChain document
-        metadata = {
-            "source": document_source,
-            "gcs_uri": gcs_uri if gcs_uri else None,
-            "gcs_blob_name": gcs_blob_name if gcs_blob_name else None,
-            "page_number": chunk.metadata.get("page", 0) if hasattr(chunk, "metadata") else 0,
-            "chunk_index": i,
-            "document_name": doc_filename
-        }
-        metadatas.append(metadata)
-        contents.append(chunk.page_content)
-    
-    # Upsert documents into ChromaDB
+    Args:
+        collection: ChromaDB collection
+        records (Iterable[ChunkRecord]): Rows to upsert
+        total (int, optional): Number of rows, if known (for the progress bar)
+    
+    Returns:
+        int: Number of chunks indexed
+    """
+    records = iter(records)
+    num_indexed = 0
+    
+    # Very large single upserts are markedly slower than several medium ones
     # Note: For ChromaDB, we need to provide embeddings directly
-    collection.upsert(
-        ids=ids,
-        embeddings=embeddings,
-        documents=contents,
-        metadatas=metadatas
+    with tqdm(total=total, desc="Indexing", unit="chunk", disable=not _show_progress) as progress:
+        while True:
+            batch = list(itertools.islice(records, UPSERT_BATCH_SIZE))
+            if not batch:
+                break
+            ids, embeddings, contents, metadatas = zip(*batch)
+            collection.upsert(
+                ids=list(ids),
+                embeddings=np.stack(embeddings),
+                documents=list(contents),
+                metadatas=list(metadatas)
+            )
+            num_indexed += len(batch)
+            progress.update(len(batch))
+            del batch, ids, embeddings, contents, metadatas
+    
+    return num_indexed
+
+
+def delete_pdf_chunks(collection, gcs_blob_name: str) -> None:
+    """
+    Delete every chunk previously indexed for a GCS blob.
+    
+    Called before re-indexing a PDF, so chunks from an earlier, longer run
+    (or one with a different chunk size) don't linger under unused IDs.
+    """
+    collection.delete(where={"gcs_blob_name": gcs_blob_name})
+
+
+def ingest_pdf_to_vectorstore(pdf_path: str, vector_store_dir: str, gcs_bucket_name: str = "minewise-bucket", gcs_blob_name: Optional[str] = None, pdf_bytes: Optional[bytes] = None, collection=None):
+    """
+    Main ingestion function that processes a PDF file and indexes it in a vector store.
+    
+    Pipeline steps:
+    1. Load PDF file (from local path or GCS)
+    2. Extract text content
+    3. Split text into chunks
+    4. Generate embeddings for each chunk
+    5. Store chunks and embeddings in ChromaDB
+    
+    Args:
+        pdf_path (str): Path to the local PDF file to process (or a label for pdf_bytes)
+        vector_store_dir (str): Directory path where ChromaDB will store its data
+        gcs_bucket_name (str): GCS bucket name (default: minewise-bucket)
+        gcs_blob_name (str, optional): GCS blob name if processing from bucket
+        pdf_bytes (bytes, optional): In-memory PDF content; if given, pdf_path is not read
+        collection (optional): Already-open ChromaDB collection; defaults to the
+            cached collection for vector_store_dir
+    
+    Returns:
+        int: Number of chunks processed and indexed
+    """
+    print("\n" + "="*70)
+    print("🚀 Starting RAG Ingestion Pipeline")
+    print("="*70 + "\n")
+    
+    records = prepare_pdf_chunks(
+        pdf_path,
+        gcs_bucket_name=gcs_bucket_name,
+        gcs_blob_name=gcs_blob_name,
+        pdf_bytes=pdf_bytes,
+        cache_dir=EMBEDDING_CHECKPOINT_DIR
     )
     
-    print(f"   ✅ Indexed {len(ids)} chunk(s) into ChromaDB collection '{collection_name}'")
+    # Step 6: Index/Upsert into ChromaDB
+    logger.info(f"6. Indexing chunks into ChromaDB at '{vector_store_dir}'...")
+    if collection is None:
+        collection = _get_chroma_collection(vector_store_dir)
+    if gcs_blob_name:
+        delete_pdf_chunks(collection, gcs_blob_name)
+    num_chunks = index_chunks(collection, records)
+    # Release the memory-mapped embeddings before deleting their checkpoint
+    del records
+    clear_embedding_checkpoint(EMBEDDING_CHECKPOINT_DIR, gcs_blob_name or pdf_path)
+    
+    logger.info(f"   ✅ Indexed {num_chunks} chunk(s) into ChromaDB collection '{COLLECTION_NAME}'")
     
     # Future integration placeholder: Vertex AI Vector Search
     # TODO: Future integration with Vertex AI Vector Search for production
@@ -272,21 +818,55 @@ def ingest_pdf_to_vectorstore(pdf_path: str, vector_store_dir: str, gcs_bucket_n
     
     print("\n" + "="*70)
     print(f"✅ Ingestion pipeline completed successfully!")
-    print(f"   Processed: {len(chunks)} chunks")
+    print(f"   Processed: {num_chunks} chunks")
     print(f"   Vector Store: {vector_store_dir}")
-    print(f"   Collection: {collection_name}")
-    if gcs_uri:
-        print(f"   GCS Location: {gcs_uri}")
+    print(f"   Collection: {COLLECTION_NAME}")
+    if gcs_blob_name:
+        print(f"   GCS Location: gs://{gcs_bucket_name}/{gcs_blob_name}")
     print("="*70 + "\n")
     
-    return len(chunks)
+    return num_chunks
+
+
+def _parse_chunk_embed(gcs_bucket_name: str, blob_name: str, cache_dir: Optional[str] = None):
+    """
+    Process pool worker: download, parse, chunk and embed one PDF from GCS.
+    
+    Page-level parallelism is disabled here since PDFs are already processed
+    one per worker. Records are materialized so they can be sent back to the
+    parent process.
+    """
+    pdf_bytes = download_pdf_bytes(gcs_bucket_name, blob_name)
+    return list(prepare_pdf_chunks(
+        blob_name,
+        gcs_bucket_name=gcs_bucket_name,
+        gcs_blob_name=blob_name,
+        pdf_bytes=pdf_bytes,
+        parallel_parse=False,
+        cache_dir=cache_dir
+    ))
 
 
 def main():
     """
     Main execution function.
     Processes all PDFs from the GCS bucket.
+    
+    PDFs are downloaded, parsed, chunked and embedded in a process pool; the
+    results are upserted into ChromaDB from this process only, so SQLite
+    keeps a single writer. PDFs whose GCS generation and chunk settings match
+    the ingestion manifest are skipped unless --force is given.
     """
+    parser = argparse.ArgumentParser(description="Ingest PDFs from GCS into ChromaDB")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-ingest every PDF, even if it is unchanged since the last run."
+    )
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    
     # Configuration
     VECTOR_STORE_DIR = "./vector_store"  # Local directory for ChromaDB
     GCS_BUCKET_NAME = "minewise-bucket"  # Your GCS bucket name
@@ -299,7 +879,8 @@ def main():
     try:
         # List all PDFs in the bucket
         print(f"📦 Listing PDFs in bucket: {GCS_BUCKET_NAME}...")
-        pdf_files = list_pdfs_in_bucket(GCS_BUCKET_NAME)
+        pdf_generations = list_pdf_generations(GCS_BUCKET_NAME)
+        pdf_files = list(pdf_generations)
         
         if not pdf_files:
             print(f"\n⚠️  No PDF files found in bucket: {GCS_BUCKET_NAME}")
@@ -311,49 +892,69 @@ def main():
             print(f"      {i}. {pdf_file}")
         print()
         
-        # Process each PDF
-        total_chunks = 0
-        temp_files = []  # Track temp files for cleanup
+        # Skip PDFs that have not changed since they were last ingested with
+        # the current chunk settings
+        manifest = {} if args.force else load_ingest_manifest(VECTOR_STORE_DIR)
+        pending_files = [
+            pdf_blob_name for pdf_blob_name in pdf_files
+            if manifest.get(pdf_blob_name, {}).get("generation") != pdf_generations[pdf_blob_name]
+            or manifest[pdf_blob_name].get("chunk_settings") != CHUNK_SETTINGS
+        ]
+        skipped_files = len(pdf_files) - len(pending_files)
+        if skipped_files:
+            print(f"⏭️  Skipping {skipped_files} unchanged PDF(s) (use --force to re-ingest)")
         
-        for pdf_blob_name in pdf_files:
-            try:
-                print(f"\n{'='*70}")
-                print(f"📄 Processing: {pdf_blob_name}")
-                print(f"{'='*70}")
-                
-                # Download PDF from GCS to a temporary file
-                temp_pdf_path = download_pdf_from_gcs(GCS_BUCKET_NAME, pdf_blob_name)
-                temp_files.append(temp_pdf_path)
-                
-                # Process the PDF
-                num_chunks = ingest_pdf_to_vectorstore(
-                    pdf_path=temp_pdf_path,
-                    vector_store_dir=VECTOR_STORE_DIR,
-                    gcs_bucket_name=GCS_BUCKET_NAME,
-                    gcs_blob_name=pdf_blob_name
-                )
-                
-                total_chunks += num_chunks
-                print(f"✅ Completed processing: {pdf_blob_name} ({num_chunks} chunks)")
-                
-            except Exception as e:
-                print(f"\n❌ Error processing {pdf_blob_name}: {e}")
-                import traceback
-                traceback.print_exc()
-                print(f"\n⚠️  Continuing with next file...")
-                continue
+        collection = _get_chroma_collection(VECTOR_STORE_DIR)
         
-        # Clean up temporary files
-        print(f"\n🧹 Cleaning up temporary files...")
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except Exception as e:
-                print(f"   ⚠️  Could not remove {temp_file}: {e}")
+        # Process PDFs in parallel; index each one as soon as it is ready
+        total_chunks = 0
+        processed_files = 0
+        failed_files = []
+        
+        with ProcessPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, MAX_INGEST_WORKERS),
+            initializer=_init_ingest_worker
+        ) as executor:
+            futures = {
+                executor.submit(_parse_chunk_embed, GCS_BUCKET_NAME, pdf_blob_name, EMBEDDING_CHECKPOINT_DIR): pdf_blob_name
+                for pdf_blob_name in pending_files
+            }
+            
+            for future in as_completed(futures):
+                pdf_blob_name = futures[future]
+                try:
+                    records = future.result()
+                    delete_pdf_chunks(collection, pdf_blob_name)
+                    num_chunks = index_chunks(collection, records, total=len(records))
+                    del records
+                    clear_embedding_checkpoint(EMBEDDING_CHECKPOINT_DIR, pdf_blob_name)
+                    
+                    total_chunks += num_chunks
+                    processed_files += 1
+                    manifest[pdf_blob_name] = {
+                        "generation": pdf_generations[pdf_blob_name],
+                        "num_chunks": num_chunks,
+                        "chunk_settings": CHUNK_SETTINGS
+                    }
+                    save_ingest_manifest(VECTOR_STORE_DIR, manifest)
+                    logger.info(f"✅ Completed processing: {pdf_blob_name} ({num_chunks} chunks)")
+                    
+                except Exception as e:
+                    logger.exception(f"❌ Error processing {pdf_blob_name}: {e}")
+                    logger.warning("⚠️  Continuing with next file...")
+                    failed_files.append(pdf_blob_name)
+                    continue
         
         print(f"\n{'='*70}")
-        print(f"🎉 Successfully processed {len(pdf_files)} PDF(s) with {total_chunks} total chunk(s)!")
+        print(f"🎉 Successfully processed {processed_files} PDF(s) with {total_chunks} total chunk(s)!")
+        if skipped_files:
+            print(f"   Skipped (unchanged): {skipped_files} PDF(s)")
+        if failed_files:
+            print(f"   Failed: {len(failed_files)} PDF(s)")
+            for pdf_blob_name in sorted(failed_files):
+                print(f"      - {pdf_blob_name}")
+        print(f"   Vector Store: {VECTOR_STORE_DIR}")
+        print(f"   Collection: {COLLECTION_NAME}")
         print(f"{'='*70}")
         
     except Exception as e:
@@ -365,4 +966,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -3,103 +3,239 @@ Document Processing Script for RAG System
 Processes PDFs and generates embeddings for Firestore storage.
 """
 
+import functools
+import hashlib
+import itertools
 import os
+import queue
 import sys
-from typing import List, Dict, Any
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
 from google.cloud import storage
 from google.cloud import firestore
 from google.cloud import aiplatform
-from google.cloud.aiplatform import TextEmbeddingModel
-import pdfplumber
+from vertexai.language_models import TextEmbeddingModel
+import fitz  # PyMuPDF
+from tokenizers import Tokenizer
 from datetime import datetime
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from embedding_quantization import WRITE_FLOAT_EMBEDDING, quantize_int8
 
 # Configuration
 PROJECT_ID = os.getenv("PROJECT_ID", "minewise-ai-4a4da")
 GCS_BUCKET_NAME = "minewise-bucket"
 REGION = "us-central1"
 LOCATION = "us-central1"
+TOKENIZER_NAME = "bert-base-uncased"
+EMBEDDING_BATCH_SIZE = 250  # Vertex AI's per-request input limit
+EMBEDDING_MAX_BATCH_TOKENS = 20000  # Vertex AI's per-request token limit
+EMBEDDING_QUEUE_SIZE = 4  # Embedded batches waiting to be written
+MAX_WRITE_ATTEMPTS = 5  # BulkWriter attempts per chunk before it is dropped
+CACHE_DIR = "./cache"  # Chunks and embeddings per PDF and chunking settings
+PARALLEL_EXTRACT_MIN_PAGES = 50  # Smaller PDFs are extracted without a process pool
+
+# Clients are created on first use rather than at import, so extraction
+# workers (which re-import this module under spawn) never build them
+
+@functools.lru_cache(maxsize=1)
+def get_firestore_client() -> firestore.Client:
+    """Create the Firestore client once per process."""
+    return firestore.Client(project=PROJECT_ID)
+
+@functools.lru_cache(maxsize=1)
+def get_gcs_bucket() -> storage.Bucket:
+    """Create the GCS client and bucket handle once per process."""
+    return storage.Client(project=PROJECT_ID).bucket(GCS_BUCKET_NAME)
+
+# PDF (file path or bytes) for extraction workers, set once per worker by the
+# pool initializer so it is not pickled for every task
+_worker_pdf_source: Union[str, bytes] = b""
 
-# Initialize clients
-storage_client = storage.Client(project=PROJECT_ID)
-firestore_client = firestore.Client(project=PROJECT_ID)
-aiplatform.init(project=PROJECT_ID, location=LOCATION)
+def _open_pdf(pdf_source: Union[str, bytes]) -> fitz.Document:
+    """Open a PDF from a file path or from in-memory bytes."""
+    if isinstance(pdf_source, bytes):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source)
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> List[Dict[str, Any]]:
-    """Extract text from PDF with page information."""
+def _init_extract_worker(pdf_source: Union[str, bytes]) -> None:
+    """Store the PDF source in the worker process."""
+    global _worker_pdf_source
+    _worker_pdf_source = pdf_source
+
+def _extract_pages(doc: fitz.Document, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract text from pages [start, end) of an open PDF."""
     text_items = []
+    total_pages = doc.page_count
     
-    with pdfplumber.open(pdf_bytes) as pdf:
-        for page_num, page in enumerate(pdf.pages, 1):
-            text = page.extract_text()
-            if text and text.strip():
-                text_items.append({
-                    "text": text.strip(),
-                    "page": page_num,
-                    "metadata": {
-                        "page_number": page_num,
-                        "total_pages": len(pdf.pages)
-                    }
-                })
+    for page_num in range(start + 1, end + 1):
+        text = doc[page_num - 1].get_text("text")
+        if text and text.strip():
+            text_items.append({
+                "text": text.strip(),
+                "page": page_num,
+                "metadata": {
+                    "page_number": page_num,
+                    "total_pages": total_pages
+                }
+            })
     
     return text_items
 
+def _extract_page_range(start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract text from pages [start, end) in a worker process."""
+    # PyMuPDF documents aren't picklable, so each worker opens its own copy
+    with _open_pdf(_worker_pdf_source) as doc:
+        return _extract_pages(doc, start, end)
+
+def extract_text_from_pdf(pdf_source: Union[str, bytes]) -> List[Dict[str, Any]]:
+    """
+    Extract text from PDF with page information.
+    
+    PDFs with PARALLEL_EXTRACT_MIN_PAGES or more pages are split into one page
+    range per CPU and extracted in a process pool; smaller ones are extracted
+    in this process, where starting a pool would cost more than it saves.
+    
+    pdf_source is a file path or the PDF bytes. With a path, PyMuPDF reads
+    pages from disk as needed and workers only receive the path.
+    """
+    with _open_pdf(pdf_source) as doc:
+        total_pages = doc.page_count
+        if total_pages < PARALLEL_EXTRACT_MIN_PAGES:
+            return _extract_pages(doc, 0, total_pages)
+    
+    # Split pages into contiguous ranges, one per worker
+    num_workers = min(os.cpu_count() or 1, total_pages)
+    bounds = [total_pages * i // num_workers for i in range(num_workers + 1)]
+    
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_extract_worker,
+        initargs=(pdf_source,)
+    ) as executor:
+        results = executor.map(_extract_page_range, bounds[:-1], bounds[1:])
+        text_items = [item for page_items in results for item in page_items]
+    
+    return sorted(text_items, key=lambda item: item["page"])
+
+def _file_sha256(path: str) -> str:
+    """Hash a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _cache_key(pdf_sha256: str, max_tokens: int, overlap_tokens: int) -> str:
+    """Key cache entries by the PDF content and every setting that shapes its chunks."""
+    settings = f"{pdf_sha256}:{TOKENIZER_NAME}:{max_tokens}:{overlap_tokens}"
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+def _cache_path(cache_key: str, suffix: str) -> str:
+    """Path of a cache file for the given cache key."""
+    return os.path.join(CACHE_DIR, f"{cache_key}{suffix}")
+
+def load_cached_chunks(cache_key: str) -> Optional[List[Dict[str, Any]]]:
+    """Return the cached chunks for a PDF, or None if it hasn't been chunked yet."""
+    path = _cache_path(cache_key, ".parquet")
+    if not os.path.exists(path):
+        return None
+    return pq.read_table(path).to_pylist()
+
+def save_cached_chunks(cache_key: str, chunks: List[Dict[str, Any]]) -> None:
+    """Cache a PDF's chunks; written to a temporary file first so a partial write is never read back."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(cache_key, ".parquet")
+    pq.write_table(pa.Table.from_pylist(chunks), path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def load_cached_embeddings(cache_key: str, num_chunks: int) -> Optional[np.ndarray]:
+    """Return the cached embeddings for a PDF, or None if missing or not matching its chunks."""
+    path = _cache_path(cache_key, ".embeddings.npy")
+    if not os.path.exists(path):
+        return None
+    embeddings = np.load(path)
+    return embeddings if len(embeddings) == num_chunks else None
+
+def save_cached_embeddings(cache_key: str, embeddings: np.ndarray) -> None:
+    """Cache a PDF's embeddings next to its chunks."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(cache_key, ".embeddings.npy")
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, embeddings)
+    os.replace(path + ".tmp", path)
+
+@functools.lru_cache(maxsize=1)
+def get_tokenizer() -> Tokenizer:
+    """Load the chunking tokenizer once per process."""
+    return Tokenizer.from_pretrained(TOKENIZER_NAME)
+
+def _token_windows(num_tokens: int, max_tokens: int, overlap_tokens: int) -> Iterator[Tuple[int, int]]:
+    """
+    Yield [start, end) token windows of at most max_tokens, overlapping by overlap_tokens.
+    
+    Stops as soon as a window reaches the end of the text, so the tail is
+    never emitted again as a window that lies entirely inside the overlap.
+    Raises ValueError if overlap_tokens >= max_tokens, since the windows
+    would then never advance.
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError(f"overlap_tokens ({overlap_tokens}) must be smaller than max_tokens ({max_tokens})")
+    
+    start = 0
+    while start < num_tokens:
+        end = min(start + max_tokens, num_tokens)
+        yield start, end
+        if end == num_tokens:
+            break
+        start = end - overlap_tokens
+
 def chunk_text_intelligent(
     text_items: List[Dict[str, Any]], 
     max_tokens: int = 500, 
     overlap_tokens: int = 50
 ) -> List[Dict[str, Any]]:
-    """Intelligent text chunking with overlap."""
+    """Token-window chunking with overlap, using a real tokenizer."""
     chunks = []
+    tokenizer = get_tokenizer()
     
     for item in text_items:
         text = item["text"]
         page = item["page"]
         
-        # Simple sentence-based chunking
-        sentences = text.split('. ')
-        current_chunk = ""
-        current_tokens = 0
-        
-        for sentence in sentences:
-            sentence_tokens = len(sentence.split())
-            
-            if current_tokens + sentence_tokens > max_tokens and current_chunk:
-                # Save current chunk
-                chunks.append({
-                    "text": current_chunk.strip(),
-                    "page": page,
-                    "tokens": current_tokens,
-                    "metadata": item["metadata"]
-                })
-                
-                # Start new chunk with overlap
-                overlap_text = '. '.join(current_chunk.split('. ')[-2:])
-                current_chunk = overlap_text + '. ' + sentence
-                current_tokens = len(current_chunk.split())
-            else:
-                current_chunk += '. ' + sentence if current_chunk else sentence
-                current_tokens += sentence_tokens
+        # Tokenize the page once; character offsets map each window back to
+        # the original text (decoding would lowercase and re-space it)
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
         
-        # Add final chunk
-        if current_chunk.strip():
+        for start, end in _token_windows(len(offsets), max_tokens, overlap_tokens):
+            window = offsets[start:end]
             chunks.append({
-                "text": current_chunk.strip(),
+                "text": text[window[0][0]:window[-1][1]],
                 "page": page,
-                "tokens": current_tokens,
+                "tokens": len(window),
                 "metadata": item["metadata"]
             })
     
     return chunks
 
+@functools.lru_cache(maxsize=4)
+def get_embedding_model(model_name: str) -> TextEmbeddingModel:
+    """Load a Vertex AI embedding model once and reuse it for every batch."""
+    aiplatform.init(project=PROJECT_ID, location=LOCATION)
+    return TextEmbeddingModel.from_pretrained(model_name)
+
 def generate_embeddings(
     texts: List[str], 
     model_name: str = "text-embedding-004",
     task_type: str = "RETRIEVAL_DOCUMENT"
-) -> List[List[float]]:
-    """Generate embeddings using Vertex AI."""
+) -> np.ndarray:
+    """Generate embeddings using Vertex AI, as an (n, 768) float32 array."""
     try:
-        model = TextEmbeddingModel.from_pretrained(model_name)
+        model = get_embedding_model(model_name)
         
         embeddings = model.get_embeddings(
             texts,
@@ -107,35 +243,38 @@ def generate_embeddings(
             task_type=task_type
         )
         
-        return [list(emb.values) for emb in embeddings]
+        return np.asarray([emb.values for emb in embeddings], dtype=np.float32)
     except Exception as e:
         print(f"Error generating embeddings: {e}")
         raise
 
-def store_in_firestore(
-    collection_name: str,
+def _write_document_metadata(
+    doc_ref: firestore.DocumentReference,
     document_name: str,
-    chunks: List[Dict[str, Any]],
-    embeddings: List[List[float]]
+    total_chunks: int,
+    status: str = "processed"
 ) -> None:
-    """Store chunks and embeddings in Firestore."""
-    
-    # Create document metadata
-    doc_ref = firestore_client.collection(collection_name).document(document_name)
+    """Write the parent document that holds the chunks subcollection."""
     doc_ref.set({
         "name": document_name,
-        "total_chunks": len(chunks),
+        "total_chunks": total_chunks,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
-        "status": "processed"
+        "status": status
     })
+
+def _write_chunks(
+    bulk_writer: firestore.BulkWriter,
+    chunks_ref: firestore.CollectionReference,
+    start_index: int,
+    chunks: List[Dict[str, Any]],
+    embeddings: np.ndarray
+) -> None:
+    """Queue chunk documents on the BulkWriter, numbered from start_index."""
+    # Embeddings are stored as int8 bytes plus a per-vector scale (~4x smaller)
+    quantized, scales = quantize_int8(embeddings)
     
-    # Store chunks in subcollection
-    chunks_ref = doc_ref.collection("chunks")
-    batch = firestore_client.batch()
-    batch_count = 0
-    
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+    for i, (chunk, embedding, embedding_q8, embedding_scale) in enumerate(zip(chunks, embeddings, quantized, scales), start_index):
         chunk_doc = chunks_ref.document(f"chunk_{i:04d}")
         
         chunk_data = {
@@ -143,62 +282,282 @@ def store_in_firestore(
             "page": chunk["page"],
             "chunk_index": i,
             "tokens": chunk["tokens"],
-            "embedding": embedding,
+            "embedding_q8": embedding_q8.tobytes(),
+            "embedding_scale": float(embedding_scale),
             "metadata": chunk["metadata"],
             "created_at": datetime.utcnow()
         }
+        if WRITE_FLOAT_EMBEDDING:
+            chunk_data["embedding"] = embedding.tolist()
+        bulk_writer.set(chunk_doc, chunk_data)
+
+def _embedding_batches(
+    chunks: List[Dict[str, Any]],
+    batch_size: int,
+    max_tokens: int = EMBEDDING_MAX_BATCH_TOKENS
+) -> Iterator[Tuple[int, int]]:
+    """Yield [start, end) chunk ranges within both the input and token limits of one request."""
+    start = 0
+    batch_tokens = 0
+    for i, chunk in enumerate(chunks):
+        if i > start and (i - start == batch_size or batch_tokens + chunk["tokens"] > max_tokens):
+            yield start, i
+            start = i
+            batch_tokens = 0
+        batch_tokens += chunk["tokens"]
+    if start < len(chunks):
+        yield start, len(chunks)
+
+def _document_runs(owners: List[int], start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Split the chunk range [start, end) of one embedding batch by document.
+    
+    owners maps each chunk to the position of its document. Yields
+    (position, run_start, run_end) for each document's consecutive run of
+    chunks in the batch.
+    """
+    for position, run in itertools.groupby(range(start, end), key=owners.__getitem__):
+        run = list(run)
+        yield position, run[0], run[-1] + 1
+
+def embed_and_store(
+    documents: List[Dict[str, Any]],
+    batch_size: int = EMBEDDING_BATCH_SIZE
+) -> List[str]:
+    """
+    Generate embeddings for the chunks of all documents and store them in Firestore.
+    
+    documents holds dicts with "collection", "name", "chunks" and optionally
+    "cache_key". Documents whose embeddings are cached under their cache_key
+    are written straight away; the others are embedded, and each one is cached
+    as soon as its last batch has been embedded.
+    
+    Chunks from all documents share embedding requests, so batches stay full
+    across document boundaries. A producer thread embeds one batch at a time
+    and hands it over through a bounded queue, while this thread writes the
+    previous batches, so the embedding and Firestore phases overlap.
+    
+    The parent documents are written once the BulkWriter has been closed and
+    all chunk writes have settled, with status "failed" for documents whose
+    embedding batches or chunk writes failed.
+    Failures only affect the documents involved. Returns the names of the
+    failed documents.
+    """
+    firestore_client = get_firestore_client()
+    bulk_writer = firestore_client.bulk_writer()
+    # Chunk writes dropped after MAX_WRITE_ATTEMPTS, per parent document path
+    failed_writes: Dict[str, int] = {}
+    failed_lock = threading.Lock()
+    
+    def on_write_error(error, writer):
+        if error.attempts < MAX_WRITE_ATTEMPTS:
+            return True  # retry with backoff
+        reference = error.operation.reference
+        with failed_lock:
+            parent_path = reference.parent.parent.path
+            failed_writes[parent_path] = failed_writes.get(parent_path, 0) + 1
+        print(f"  ⚠️  Error writing {reference.path}: {error.message}")
+        return False
+    
+    bulk_writer.on_write_error(on_write_error)
+    failed_documents = []
+    # Documents whose chunks have all been queued; their parents are written
+    # after the final close, so the BulkWriter is never flushed mid-run
+    finished = []
+    
+    def record_status(state: Dict[str, Any]) -> None:
+        doc = state["doc"]
+        with failed_lock:
+            dropped = failed_writes.get(state["doc_ref"].path, 0)
+        if state["error"] is None and dropped:
+            state["error"] = f"{dropped} chunk write(s) failed after {MAX_WRITE_ATTEMPTS} attempts"
+        
+        status = "processed" if state["error"] is None else "failed"
+        _write_document_metadata(state["doc_ref"], doc["name"], len(doc["chunks"]), status)
+        if state["error"] is None:
+            print(f"  Committed {len(doc['chunks'])} chunks for {doc['name']}...")
+        else:
+            print(f"❌ Error processing {doc['name']}: {state['error']}")
+            failed_documents.append(doc["name"])
+    
+    # Documents still to embed, and for each of their chunks (concatenated in
+    # all_chunks) the position of its document in pending
+    pending = []
+    owners = []
+    all_chunks = []
+    for doc in documents:
+        doc_ref = firestore_client.collection(doc["collection"]).document(doc["name"])
+        state = {
+            "doc": doc,
+            "doc_ref": doc_ref,
+            "chunks_ref": doc_ref.collection("chunks"),
+            "start": len(all_chunks),
+            "end": len(all_chunks) + len(doc["chunks"]),
+            "parts": [],
+            "error": None
+        }
+        cache_key = doc.get("cache_key")
+        
+        cached = load_cached_embeddings(cache_key, len(doc["chunks"])) if cache_key else None
+        if cached is not None:
+            print(f"Using cached embeddings for {doc['name']}")
+            _write_chunks(bulk_writer, state["chunks_ref"], 0, doc["chunks"], cached)
+            finished.append(state)
+            continue
+        if not doc["chunks"]:
+            finished.append(state)
+            continue
+        
+        owners.extend([len(pending)] * len(doc["chunks"]))
+        all_chunks.extend(doc["chunks"])
+        pending.append(state)
+    
+    embedded_batches = queue.Queue(maxsize=EMBEDDING_QUEUE_SIZE)
+    batches = list(_embedding_batches(all_chunks, batch_size))
+    # Set when the consumer fails, so the producer stops instead of blocking
+    # forever on a full queue
+    stop = threading.Event()
+    
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                embedded_batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce() -> None:
+        try:
+            for batch_num, (start, end) in enumerate(batches, 1):
+                if stop.is_set():
+                    return
+                print(f"Processing batch {batch_num}/{len(batches)}")
+                # A failed batch only fails the documents it contains
+                try:
+                    batch_embeddings = generate_embeddings([chunk["text"] for chunk in all_chunks[start:end]])
+                    error = None
+                except Exception as e:
+                    batch_embeddings, error = None, e
+                if not put((start, end, batch_embeddings, error)):
+                    return
+        finally:
+            put(None)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            producer = executor.submit(produce)
+            try:
+                while (item := embedded_batches.get()) is not None:
+                    start, end, batch_embeddings, error = item
+                    # A batch can span documents; handle each document's run of chunks
+                    for position, run_start, run_end in _document_runs(owners, start, end):
+                        state = pending[position]
+                        if error is not None:
+                            state["error"] = state["error"] or error
+                        elif state["error"] is None:
+                            run_embeddings = batch_embeddings[run_start - start:run_end - start]
+                            state["parts"].append(run_embeddings)
+                            _write_chunks(
+                                bulk_writer, state["chunks_ref"], run_start - state["start"],
+                                all_chunks[run_start:run_end], run_embeddings
+                            )
+                        if run_end == state["end"]:
+                            # Cache right away so a later failure doesn't
+                            # cost this document's embeddings
+                            cache_key = state["doc"].get("cache_key")
+                            if cache_key and state["error"] is None:
+                                save_cached_embeddings(cache_key, np.concatenate(state["parts"]))
+                            finished.append(state)
+            except BaseException:
+                stop.set()
+                # Drain the queue so a producer mid-put is released right away
+                while True:
+                    try:
+                        embedded_batches.get_nowait()
+                    except queue.Empty:
+                        break
+                raise
+            producer.result()
+    finally:
+        bulk_writer.close()
+        for state in finished:
+            record_status(state)
+    
+    return failed_documents
+
+def extract_and_chunk(
+    gcs_path: str,
+    max_tokens: int = 500,
+    overlap_tokens: int = 50
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Download a PDF from GCS, extract its text and split it into chunks.
+    
+    Returns the key of the PDF's cache entries, derived from its SHA-256 and
+    the chunking settings, and the chunks. Chunks already cached for the same
+    PDF content and settings are reused.
+    """
+    # Stream the PDF from GCS to a temporary file rather than into memory;
+    # PyMuPDF then only reads the pages it is extracting
+    blob = get_gcs_bucket().blob(gcs_path)
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as pdf_file:
+            blob.download_to_file(pdf_file)
         
-        batch.set(chunk_doc, chunk_data)
-        batch_count += 1
+        cache_key = _cache_key(_file_sha256(pdf_path), max_tokens, overlap_tokens)
+        chunks = load_cached_chunks(cache_key)
+        if chunks is not None:
+            print(f"Using {len(chunks)} cached chunks")
+            return cache_key, chunks
         
-        # Commit batch every 500 operations (Firestore limit)
-        if batch_count >= 500:
-            batch.commit()
-            batch = firestore_client.batch()
-            batch_count = 0
-            print(f"  Committed batch of 500 chunks...")
-    
-    # Commit remaining chunks
-    if batch_count > 0:
-        batch.commit()
-        print(f"  Committed final batch of {batch_count} chunks...")
-
-def process_document(gcs_path: str, collection_name: str, document_name: str):
-    """Main processing function."""
-    print(f"Processing {document_name} from {gcs_path}...")
-    
-    # Download from GCS
-    bucket = storage_client.bucket(GCS_BUCKET_NAME)
-    blob = bucket.blob(gcs_path)
-    pdf_bytes = blob.download_as_bytes()
-    
-    # Extract text
-    print("Extracting text...")
-    text_items = extract_text_from_pdf(pdf_bytes)
+        # Extract text
+        print("Extracting text...")
+        text_items = extract_text_from_pdf(pdf_path)
+    finally:
+        os.remove(pdf_path)
     
     # Chunk text
     print("Chunking text...")
-    chunks = chunk_text_intelligent(text_items, max_tokens=500, overlap_tokens=50)
+    chunks = chunk_text_intelligent(text_items, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
     print(f"Created {len(chunks)} chunks")
+    save_cached_chunks(cache_key, chunks)
+    return cache_key, chunks
+
+def process_documents(documents: List[Dict[str, Any]]) -> None:
+    """
+    Main processing function.
     
-    # Generate embeddings in batches
-    print("Generating embeddings...")
-    batch_size = 20  # Avoid token limits
-    all_embeddings = []
+    documents holds dicts with "gcs_path", "collection" and "name". All
+    documents are extracted and chunked first, then embedded and stored
+    together.
+    """
+    chunked_documents = []
+    for doc in documents:
+        print(f"Processing {doc['name']} from {doc['gcs_path']}...")
+        try:
+            cache_key, chunks = extract_and_chunk(doc["gcs_path"])
+        except Exception as e:
+            print(f"❌ Error processing {doc['name']}: {e}")
+            continue
+        chunked_documents.append({
+            "collection": doc["collection"],
+            "name": doc["name"],
+            "chunks": chunks,
+            "cache_key": cache_key
+        })
     
-    for i in range(0, len(chunks), batch_size):
-        batch_chunks = chunks[i:i + batch_size]
-        batch_texts = [chunk["text"] for chunk in batch_chunks]
-        
-        print(f"Processing batch {i // batch_size + 1}/{(len(chunks) + batch_size - 1) // batch_size}")
-        batch_embeddings = generate_embeddings(batch_texts)
-        all_embeddings.extend(batch_embeddings)
+    if not chunked_documents:
+        return
     
-    # Store in Firestore
-    print("Storing in Firestore...")
-    store_in_firestore(collection_name, document_name, chunks, all_embeddings)
+    # Generate embeddings in batches and store them in Firestore as they arrive
+    print("Generating embeddings and storing in Firestore...")
+    failed_documents = embed_and_store(chunked_documents)
     
-    print(f"✅ Successfully processed {document_name}")
+    for doc in chunked_documents:
+        if doc["name"] not in failed_documents:
+            print(f"✅ Successfully processed {doc['name']}")
 
 if __name__ == "__main__":
     # Example usage
@@ -220,9 +579,8 @@ if __name__ == "__main__":
         }
     ]
     
-    for doc in documents:
-        try:
-            process_document(doc["gcs_path"], doc["collection"], doc["name"])
-        except Exception as e:
-            print(f"❌ Error processing {doc['name']}: {e}")
+    try:
+        process_documents(documents)
+    except Exception as e:
+        print(f"❌ Error processing documents: {e}")
 
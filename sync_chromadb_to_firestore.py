@@ -11,13 +11,33 @@ This bridges the gap between:
 
 import os
 import sys
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Iterator
 
 # Google Cloud imports
 from google.cloud import firestore
 from google.auth import default as google_auth_default
 import chromadb
 from chromadb.config import Settings
+import numpy as np
+
+from embedding_quantization import WRITE_FLOAT_EMBEDDING, quantize_int8
+
+# Chunks read from ChromaDB per collection.get() call
+CHROMADB_PAGE_SIZE = 1000
+
+# BulkWriter attempts per chunk before it is counted as skipped
+MAX_WRITE_ATTEMPTS = 5
+
+# ChromaDB metadata keys copied to Firestore, with their defaults
+METADATA_FIELDS = (
+    ("source", ""),
+    ("gcs_uri", ""),
+    ("gcs_blob_name", ""),
+    ("page_number", 0),
+    ("chunk_index", 0),
+    ("document_name", ""),
+)
 
 
 def setup_google_cloud_authentication():
@@ -41,6 +61,30 @@ def setup_google_cloud_authentication():
         raise
 
 
+def iter_chromadb_pages(collection, page_size: int = CHROMADB_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the collection's chunks one page at a time.
+    
+    Args:
+        collection: ChromaDB collection
+        page_size (int): Number of chunks per page
+    
+    Yields:
+        Dict[str, Any]: collection.get() results with ids, documents, embeddings and metadatas
+    """
+    offset = 0
+    while True:
+        results = collection.get(
+            limit=page_size,
+            offset=offset,
+            include=["documents", "embeddings", "metadatas"]
+        )
+        if not results["ids"]:
+            break
+        yield results
+        offset += len(results["ids"])
+
+
 def sync_chromadb_to_firestore(
     chromadb_dir: str = "./vector_store",
     collection_name: str = "pdf_documents",
@@ -76,16 +120,15 @@ def sync_chromadb_to_firestore(
         print(f"   ❌ Error connecting to ChromaDB: {e}")
         raise
     
-    # Get all documents from ChromaDB
-    print(f"3. Retrieving all chunks from ChromaDB...")
+    # Count chunks in ChromaDB (they are read page by page while syncing)
+    print(f"3. Counting chunks in ChromaDB...")
     try:
-        results = collection.get(include=["documents", "embeddings", "metadatas"])
+        num_chunks = collection.count()
         
-        if not results["ids"] or len(results["ids"]) == 0:
+        if num_chunks == 0:
             print("   ⚠️  No documents found in ChromaDB collection")
             return 0
         
-        num_chunks = len(results["ids"])
         print(f"   ✅ Found {num_chunks} chunk(s) in ChromaDB")
     except Exception as e:
         print(f"   ❌ Error retrieving from ChromaDB: {e}")
@@ -101,36 +144,56 @@ def sync_chromadb_to_firestore(
         print(f"   ❌ Error connecting to Firestore: {e}")
         raise
     
-    # Sync each chunk to Firestore
+    # Sync each chunk to Firestore; BulkWriter batches and parallelizes the
+    # writes and reports each result through the callbacks below
     print(f"5. Syncing chunks to Firestore...")
     synced_count = 0
     skipped_count = 0
+    counts_lock = threading.Lock()
+    bulk_writer = db.bulk_writer()
+    
+    def on_write_result(reference, result, writer):
+        nonlocal synced_count
+        with counts_lock:
+            synced_count += 1
+            if synced_count % 10 == 0:
+                print(f"   Progress: {synced_count}/{num_chunks} chunks synced...")
     
-    for i, (chunk_id, document, embedding, metadata) in enumerate(
-        zip(results["ids"], results["documents"], results["embeddings"], results["metadatas"]),
-        1
-    ):
+    def on_write_error(error, writer):
+        nonlocal skipped_count
+        if error.attempts < MAX_WRITE_ATTEMPTS:
+            return True  # retry with backoff
+        with counts_lock:
+            skipped_count += 1
+        print(f"   ⚠️  Error syncing chunk {error.operation.reference.id}: {error.message}")
+        return False
+    
+    bulk_writer.on_write_result(on_write_result)
+    bulk_writer.on_write_error(on_write_error)
+    
+    # Pages are read lazily, so reading the next page overlaps with the
+    # BulkWriter sending the previous one. Each page's embeddings are
+    # converted to one contiguous float32 matrix and quantized to int8 up front.
+    def iter_rows():
+        for page in iter_chromadb_pages(collection):
+            emb_matrix = np.asarray(page["embeddings"], dtype=np.float32)
+            quantized, scales = quantize_int8(emb_matrix)
+            yield from zip(page["ids"], page["documents"], emb_matrix, quantized, scales, page["metadatas"])
+    
+    rows = iter_rows()
+    server_timestamp = firestore.SERVER_TIMESTAMP
+    # Firestore IDs of every chunk currently in ChromaDB
+    chromadb_doc_ids = set()
+    
+    for i, (chunk_id, document, embedding, embedding_q8, embedding_scale, metadata) in enumerate(rows, 1):
         try:
             # Extract metadata
-            source = metadata.get("source", "") if metadata else ""
-            gcs_uri = metadata.get("gcs_uri", "") if metadata else ""
-            gcs_blob_name = metadata.get("gcs_blob_name", "") if metadata else ""
-            page_number = metadata.get("page_number", 0) if metadata else 0
-            chunk_index = metadata.get("chunk_index", 0) if metadata else 0
-            document_name = metadata.get("document_name", "") if metadata else ""
+            metadata = metadata or {}
+            source, gcs_uri, gcs_blob_name, page_number, chunk_index, document_name = (
+                metadata.get(key, default) for key, default in METADATA_FIELDS
+            )
             
-            # Convert embedding to list if it's a NumPy array or other type
-            if embedding is not None:
-                if hasattr(embedding, 'tolist'):
-                    embedding_list = embedding.tolist()
-                elif isinstance(embedding, list):
-                    embedding_list = embedding
-                else:
-                    embedding_list = list(embedding)
-                embedding_dim = len(embedding_list)
-            else:
-                embedding_list = []
-                embedding_dim = 768
+            embedding_dim = embedding_q8.shape[0]
             
             # Create document ID from chunk_id (ChromaDB ID) or generate one
             # Use chunk_id if it's a valid Firestore document ID format
@@ -139,49 +202,60 @@ def sync_chromadb_to_firestore(
             # Prepare Firestore document
             firestore_doc = {
                 "content": document,
-                "embedding": embedding_list,
+                # int8 embedding (~4x smaller than float32); retrieval
+                # dequantizes with embeddingScale
+                "embeddingQ8": embedding_q8.tobytes(),
+                "embeddingScale": float(embedding_scale),
+                # Float embedding, only kept for retrieval deployments that
+                # predate embeddingQ8
+                "embedding": embedding.tolist() if WRITE_FLOAT_EMBEDDING else firestore.DELETE_FIELD,
                 "documentId": gcs_blob_name or document_name or source,
                 "source": gcs_uri or source,
                 "pageNumber": page_number,
                 "chunkIndex": chunk_index,
                 "documentName": document_name,
                 "embeddingDim": embedding_dim,
-                "createdAt": firestore.SERVER_TIMESTAMP,
+                "createdAt": server_timestamp,
                 "syncedFrom": "chromadb",
                 "chromadbId": chunk_id
             }
             
-            # Check if document already exists (upsert behavior)
+            # Upsert: merge into an existing document or create it, without
+            # a read round trip first
             doc_ref = firestore_ref.document(firestore_doc_id)
-            existing_doc = doc_ref.get()
-            
-            if existing_doc.exists:
-                # Update existing document
-                doc_ref.update(firestore_doc)
-                action = "updated"
-            else:
-                # Create new document
-                doc_ref.set(firestore_doc)
-                action = "created"
-            
-            synced_count += 1
-            
-            if i % 10 == 0:
-                print(f"   Progress: {i}/{num_chunks} chunks synced...")
+            chromadb_doc_ids.add(firestore_doc_id)
+            bulk_writer.set(doc_ref, firestore_doc, merge=True)
             
         except Exception as e:
             print(f"   ⚠️  Error syncing chunk {chunk_id}: {e}")
-            skipped_count += 1
+            with counts_lock:
+                skipped_count += 1
             continue
     
+    # Wait for all queued writes to finish
+    bulk_writer.close()
+    
     print(f"\n   ✅ Successfully synced {synced_count} chunk(s)")
     if skipped_count > 0:
         print(f"   ⚠️  Skipped {skipped_count} chunk(s) due to errors")
     
+    # Remove synced chunks that no longer exist in ChromaDB (e.g. from a PDF
+    # that was re-ingested into fewer chunks or under new chunk IDs)
+    print(f"6. Removing stale chunks from Firestore...")
+    stale_writer = db.bulk_writer()
+    removed_count = 0
+    for snapshot in firestore_ref.where("syncedFrom", "==", "chromadb").select([]).stream():
+        if snapshot.id not in chromadb_doc_ids:
+            stale_writer.delete(snapshot.reference)
+            removed_count += 1
+    stale_writer.close()
+    print(f"   ✅ Removed {removed_count} stale chunk(s)")
+    
     print("\n" + "="*70)
     print(f"🎉 Sync completed!")
     print(f"   Synced: {synced_count} chunks")
     print(f"   Skipped: {skipped_count} chunks")
+    print(f"   Removed (stale): {removed_count} chunks")
     print(f"   Firestore Collection: {firestore_collection}")
     print("="*70 + "\n")
     
@@ -0,0 +1,31 @@
+"""Tests for the int8 embedding quantization shared by the Firestore writers."""
+
+import numpy as np
+
+from embedding_quantization import quantize_int8
+
+
+def test_quantize_int8_round_trip():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(4, 768)).astype(np.float32)
+    quantized, scales = quantize_int8(embeddings)
+
+    assert quantized.dtype == np.int8
+    assert quantized.shape == embeddings.shape
+    assert scales.dtype == np.float32
+    assert scales.shape == (4,)
+    # Rounding costs at most half a quantization step per component
+    restored = quantized.astype(np.float32) * scales[:, None]
+    assert np.all(np.abs(restored - embeddings) <= scales[:, None] / 2 + 1e-6)
+
+
+def test_quantize_int8_uses_full_range():
+    quantized, _ = quantize_int8(np.array([[100.0, -254.0, 50.0]], dtype=np.float32))
+    assert quantized.tolist() == [[50, -127, 25]]
+
+
+def test_quantize_int8_zero_vector():
+    quantized, scales = quantize_int8(np.zeros((2, 3), dtype=np.float32))
+    assert not quantized.any()
+    assert np.all(np.isfinite(scales))
+    assert (quantized.astype(np.float32) * scales[:, None]).tolist() == [[0.0] * 3] * 2
@@ -0,0 +1,55 @@
+"""Tests for the chunk windowing and embedding batching in process_documents."""
+
+import pytest
+
+from process_documents import _document_runs, _embedding_batches, _token_windows
+
+
+def test_token_windows_overlap_without_duplicate_tail():
+    assert list(_token_windows(1000, 500, 50)) == [(0, 500), (450, 950), (900, 1000)]
+
+
+def test_token_windows_exact_fit_is_one_chunk():
+    assert list(_token_windows(500, 500, 50)) == [(0, 500)]
+
+
+def test_token_windows_empty_text():
+    assert list(_token_windows(0, 500, 50)) == []
+
+
+@pytest.mark.parametrize("overlap_tokens", [500, 600])
+def test_token_windows_rejects_overlap_not_smaller_than_window(overlap_tokens):
+    with pytest.raises(ValueError):
+        list(_token_windows(1000, 500, overlap_tokens))
+
+
+def _chunks(*tokens):
+    return [{"text": "", "tokens": count} for count in tokens]
+
+
+def test_embedding_batches_split_at_batch_size():
+    assert list(_embedding_batches(_chunks(*[1] * 5), 2)) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_embedding_batches_split_before_exceeding_token_cap():
+    chunks = _chunks(400, 400, 300, 100)
+    assert list(_embedding_batches(chunks, 250, max_tokens=1000)) == [(0, 2), (2, 4)]
+
+
+def test_embedding_batches_oversized_chunk_gets_own_batch():
+    chunks = _chunks(100, 1500, 100)
+    assert list(_embedding_batches(chunks, 250, max_tokens=1000)) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_embedding_batches_no_chunks():
+    assert list(_embedding_batches([], 250)) == []
+
+
+def test_document_runs_split_batch_spanning_documents():
+    owners = [0, 0, 0, 1, 2, 2]
+    assert list(_document_runs(owners, 1, 6)) == [(0, 1, 3), (1, 3, 4), (2, 4, 6)]
+
+
+def test_document_runs_batch_within_one_document():
+    owners = [0, 0, 0, 0]
+    assert list(_document_runs(owners, 1, 3)) == [(0, 1, 3)]